@@ -51,35 +51,38 @@ def step_generate_portfolio(stress=False):
     else:
         print_step("Creating 500 synthetic loans...")
     
-    rows = ifrs9_data.generate_portfolio(n=500, seed=42, stress=stress)
+    portfolio = ifrs9_data.generate_portfolio(n=500, seed=42, stress=stress)
 
     print_step("Saving to data/ifrs9_portfolio.csv...")
-    ifrs9_data.save_csv(rows, out_file="data/ifrs9_portfolio.csv")
+    ifrs9_data.save_csv(portfolio, out_file="data/ifrs9_portfolio.csv")
 
-    print_done(f"Portfolio generated: {len(rows)} loans saved.")
+    print_done(f"Portfolio generated: {len(portfolio)} loans saved.")
+    return portfolio
 
 
-def step_calculate_ecl():
-    """Step 2: Assign stages and calculate weighted ECL."""
+def step_calculate_ecl(portfolio=None):
+    """Step 2: Assign stages and calculate weighted ECL.
+
+    Uses the in-memory portfolio from Step 1 when given, otherwise loads
+    data/ifrs9_portfolio.csv.
+    """
     print_header("STEP 2: Classification & ECL Calculation")
     print_step("Importing ecl_engine module...")
 
     from src import ecl_engine
 
-    print_step("Loading portfolio...")
-    portfolio = ecl_engine.load_portfolio("data/ifrs9_portfolio.csv")
-    print_done(f"{len(portfolio)} loans loaded.")
+    if portfolio is None:
+        print_step("Loading portfolio...")
+        portfolio = ecl_engine.load_portfolio("data/ifrs9_portfolio.csv")
+        print_done(f"{len(portfolio)} loans loaded.")
 
     print_step("Assigning IFRS9 Stages (1, 2, 3)...")
     print_step("Calculating weighted ECL (Optimistic 30%, Base 40%, Downturn 30%)...")
     results = ecl_engine.process_portfolio(portfolio)
 
     # Compute summary stats
-    stage_counts = {1: 0, 2: 0, 3: 0}
-    total_ecl = 0.0
-    for r in results:
-        stage_counts[r["Stage"]] += 1
-        total_ecl += r["ECL"]
+    stage_counts = results["Stage"].value_counts().reindex((1, 2, 3), fill_value=0)
+    total_ecl = results["ECL"].sum()
 
     print_done("Classification completed.")
     print(f"       Stage 1: {stage_counts[1]} loans")
@@ -103,24 +106,29 @@ def step_generate_visualizations():
     data = ifrs9_viz.load_results("data/ifrs9_results.csv")
     print_done(f"{len(data)} loans loaded for visualization.")
 
+    print_step("Aggregating exposures and scenario ECLs by sector...")
+    encoded_sectors = ifrs9_viz.encode_sectors(data)
+    principals = ifrs9_viz.aggregate_principals(data, encoded_sectors)
+    scenario_ecls = ifrs9_viz.compute_scenario_ecls(data, encoded_sectors)
+
     print_step("Creating Sunburst chart (Sector → Stage)...")
-    sunburst_fig = ifrs9_viz.create_sunburst(data)
-    sunburst_fig.write_html("chart_sunburst.html")
+    sunburst_fig = ifrs9_viz.create_sunburst(data, principals)
+    ifrs9_viz.save_html(sunburst_fig, "chart_sunburst.html")
     print_done("chart_sunburst.html generated.")
 
     print_step("Creating Bar Chart (ECL Base vs Downturn)...")
-    bar_fig = ifrs9_viz.create_ecl_comparison_bar(data)
-    bar_fig.write_html("chart_ecl_comparison.html")
+    bar_fig = ifrs9_viz.create_ecl_comparison_bar(data, scenario_ecls)
+    ifrs9_viz.save_html(bar_fig, "chart_ecl_comparison.html")
     print_done("chart_ecl_comparison.html generated.")
 
     print_step("Creating KPI Cards (Provisions & Coverage)...")
     kpi_fig = ifrs9_viz.create_kpi_cards(data)
-    kpi_fig.write_html("chart_kpi.html")
+    ifrs9_viz.save_html(kpi_fig, "chart_kpi.html")
     print_done("chart_kpi.html generated.")
 
     print_step("Creating combined dashboard...")
-    dashboard_fig = ifrs9_viz.create_dashboard(data)
-    dashboard_fig.write_html("ifrs9_dashboard.html")
+    dashboard_fig = ifrs9_viz.create_dashboard(data, principals, scenario_ecls)
+    ifrs9_viz.save_html(dashboard_fig, "ifrs9_dashboard.html")
     print_done("ifrs9_dashboard.html generated.")
 
 
@@ -141,8 +149,8 @@ def main():
     print("█" * 60)
 
     # Execute pipeline steps
-    step_generate_portfolio(stress=args.stress)
-    step_calculate_ecl()
+    portfolio = step_generate_portfolio(stress=args.stress)
+    step_calculate_ecl(portfolio)
     step_generate_visualizations()
 
     # Final summary
@@ -157,6 +165,7 @@ def main():
     print("    • chart_sunburst.html        — Sector/Stage breakdown")
     print("    • chart_ecl_comparison.html  — Base/Downturn comparison")
     print("    • chart_kpi.html             — Key performance indicators")
+    print("    • plotly.min.js              — Plotly library shared by the charts")
     print()
     print("  → Open ifrs9_dashboard.html in your browser.")
     print()
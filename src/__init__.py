@@ -1,8 +1,8 @@
 # IFRS 9 ECL Engine - Source Package
-"""Core modules for IFRS9 Expected Credit Loss calculation."""
+"""Core modules for IFRS9 Expected Credit Loss calculation.
 
-from . import ifrs9_data
-from . import ecl_engine
-from . import ifrs9_viz
+Submodules are not imported here so that callers only pay for what they
+use (e.g. Plotly is loaded only when ifrs9_viz is imported).
+"""
 
 __all__ = ["ifrs9_data", "ecl_engine", "ifrs9_viz"]
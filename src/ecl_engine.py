@@ -6,8 +6,8 @@ and outputs ifrs9_results.csv.
 
 Usage: python ecl_engine.py
 """
-import csv
-from typing import List, Dict
+import numpy as np
+import pandas as pd
 
 # Scenario weights
 SCENARIO_WEIGHTS = {
@@ -23,24 +23,28 @@ PD_MULTIPLIERS = {
     "Downturn": 1.50,
 }
 
+# Array forms of the above, one entry per scenario, for the vectorised kernel
+_WEIGHTS = np.array(list(SCENARIO_WEIGHTS.values()))
+_MULTS = np.array([PD_MULTIPLIERS[scenario] for scenario in SCENARIO_WEIGHTS])
+
+# Column types of the portfolio CSV (the blank Stage column is not loaded)
+PORTFOLIO_DTYPES = {
+    "Loan_ID": str,
+    "Sector": "category",
+    "Principal": np.float64,
+    "Initial_PD": np.float64,
+    "Current_PD": np.float64,
+    "Maturity_Years": np.int32,
+    "EIR": np.float64,
+    "LGD": np.float64,
+}
+
+RESULT_COLUMNS = list(PORTFOLIO_DTYPES) + ["Stage", "ECL"]
+
 
-def load_portfolio(filepath: str) -> List[Dict]:
-    """Load portfolio CSV into a list of dicts with numeric conversion."""
-    rows = []
-    with open(filepath, "r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            rows.append({
-                "Loan_ID": row["Loan_ID"],
-                "Sector": row["Sector"],
-                "Principal": float(row["Principal"]),
-                "Initial_PD": float(row["Initial_PD"]),
-                "Current_PD": float(row["Current_PD"]),
-                "Maturity_Years": int(row["Maturity_Years"]),
-                "EIR": float(row["EIR"]),
-                "LGD": float(row["LGD"]),
-            })
-    return rows
+def load_portfolio(filepath: str) -> pd.DataFrame:
+    """Load portfolio CSV into a DataFrame with typed columns."""
+    return pd.read_csv(filepath, usecols=list(PORTFOLIO_DTYPES), dtype=PORTFOLIO_DTYPES)
 
 
 def assign_stage(initial_pd: float, current_pd: float) -> int:
@@ -58,6 +62,21 @@ def assign_stage(initial_pd: float, current_pd: float) -> int:
     return 1
 
 
+def _ecl_lifetime(pd_adj, loss, maturity_years, eir):
+    """Lifetime ECL: sum of discounted marginal losses for t = 1..maturity.
+
+    Marginal PD in year t = (1 - pd_adj)^(t-1) * pd_adj and the discount
+    factor is (1 + eir)^-t, so the terms form a geometric series with ratio
+    r = (1 - pd_adj) / (1 + eir) that is summed in closed form. `loss` is
+    the amount lost on default (LGD * EAD). Accepts scalars or NumPy arrays.
+    """
+    v = 1.0 / (1.0 + eir)
+    r = np.asarray((1.0 - pd_adj) * v)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = np.where(r == 1.0, maturity_years, (1.0 - r ** maturity_years) / (1.0 - r))
+    return pd_adj * (loss * v) * annuity
+
+
 def calculate_ecl(
     stage: int,
     current_pd: float,
@@ -70,7 +89,8 @@ def calculate_ecl(
     """Compute ECL for a single loan under a given scenario.
 
     Stage 1: 12-month ECL = PD_12m * LGD * EAD
-    Stage 2 & 3: Lifetime ECL = sum of discounted marginal losses.
+    Stage 2 & 3: Lifetime ECL = sum of discounted marginal losses
+    (geometric series, evaluated in closed form).
 
     Args:
         stage: IFRS9 stage (1, 2, or 3)
@@ -93,17 +113,9 @@ def calculate_ecl(
         ecl = pd_12m * lgd * ead
     else:
         # Lifetime ECL: sum discounted marginal losses
-        ecl = 0.0
-        cum_survival = 1.0  # survival probability up to t-1
-        for t in range(1, maturity_years + 1):
-            # Marginal PD in year t = P(survive to t-1) * P(default in year t)
-            marginal_pd = cum_survival * pd_adj
-            discount_factor = 1.0 / ((1.0 + eir) ** t)
-            ecl += marginal_pd * lgd * ead * discount_factor
-            # Update cumulative survival
-            cum_survival *= (1.0 - pd_adj)
+        ecl = float(_ecl_lifetime(pd_adj, lgd * ead, maturity_years, eir))
 
-    return round(ecl, 2)
+    return ecl
 
 
 def calculate_weighted_ecl(
@@ -120,55 +132,111 @@ def calculate_weighted_ecl(
         mult = PD_MULTIPLIERS[scenario]
         ecl_scenario = calculate_ecl(stage, current_pd, lgd, ead, maturity_years, eir, mult)
         weighted_ecl += weight * ecl_scenario
-    return round(weighted_ecl, 2)
-
-
-def process_portfolio(portfolio: List[Dict]) -> List[Dict]:
-    """Assign stages and calculate ECL for each loan."""
-    results = []
-    for loan in portfolio:
-        stage = assign_stage(loan["Initial_PD"], loan["Current_PD"])
-        ecl = calculate_weighted_ecl(
-            stage=stage,
-            current_pd=loan["Current_PD"],
-            lgd=loan["LGD"],
-            ead=loan["Principal"],
-            maturity_years=loan["Maturity_Years"],
-            eir=loan["EIR"],
-        )
-        results.append({
-            "Loan_ID": loan["Loan_ID"],
-            "Sector": loan["Sector"],
-            "Principal": loan["Principal"],
-            "Initial_PD": loan["Initial_PD"],
-            "Current_PD": loan["Current_PD"],
-            "Maturity_Years": loan["Maturity_Years"],
-            "EIR": loan["EIR"],
-            "LGD": loan["LGD"],
-            "Stage": stage,
-            "ECL": ecl,
-        })
+    return weighted_ecl
+
+
+def assign_stage_vectorized(initial_pd: np.ndarray, current_pd: np.ndarray) -> np.ndarray:
+    """Array version of assign_stage, applying the same rules element-wise.
+
+    The PD ratio is only evaluated where Initial_PD > 0 (0 elsewhere), and
+    np.select applies the rules in order without branching. Stages are
+    returned as int8.
+    """
+    ratio = np.divide(
+        current_pd, initial_pd, out=np.zeros(np.shape(current_pd)), where=initial_pd > 0
+    )
+    stage = np.select([current_pd > 0.5, ratio > 3.0], [3, 2], default=1)
+    return stage.astype(np.int8)
+
+
+def calculate_ecl_vectorized(
+    stage: np.ndarray,
+    current_pd: np.ndarray,
+    lgd: np.ndarray,
+    ead: np.ndarray,
+    maturity_years: np.ndarray,
+    eir: np.ndarray,
+    pd_multiplier=1.0,
+) -> np.ndarray:
+    """Array version of calculate_ecl.
+
+    Loan arguments are arrays with loans along the first axis; passing
+    them as (n_loans, 1) columns with an array of multipliers prices every
+    scenario at once. Stage 2 & 3 loans are picked out along the loan axis
+    before broadcasting, so the lifetime series is only evaluated for them
+    and their per-loan terms are not expanded to one per scenario.
+    """
+    pd_adj = np.minimum(current_pd * pd_multiplier, 1.0)
+
+    # Loss on default, computed once per loan and shared by all scenarios
+    loss = lgd * ead
+
+    # Stage 1: 12-month ECL
+    ecl = pd_adj * loss
+
+    # Stage 2 & 3: lifetime ECL
+    lifetime = np.flatnonzero(stage != 1)
+    ecl[lifetime] = _ecl_lifetime(
+        pd_adj[lifetime], loss[lifetime], maturity_years[lifetime], eir[lifetime]
+    )
+
+    return ecl
+
+
+def calculate_weighted_ecl_vectorized(
+    stage: np.ndarray,
+    current_pd: np.ndarray,
+    lgd: np.ndarray,
+    ead: np.ndarray,
+    maturity_years: np.ndarray,
+    eir: np.ndarray,
+) -> np.ndarray:
+    """Array version of calculate_weighted_ecl.
+
+    Builds an (n_loans, n_scenarios) ECL matrix in one broadcast call and
+    weights it with a single matrix-vector product.
+    """
+    ecl_matrix = calculate_ecl_vectorized(
+        stage[:, None],
+        current_pd[:, None],
+        lgd[:, None],
+        ead[:, None],
+        maturity_years[:, None],
+        eir[:, None],
+        _MULTS,
+    )
+    return ecl_matrix @ _WEIGHTS
+
+
+def process_portfolio(portfolio: pd.DataFrame) -> pd.DataFrame:
+    """Assign stages and calculate ECL for each loan.
+
+    Loan fields are taken as one array per column so that staging and ECL
+    are computed for the whole portfolio at once. Accepts either a frame
+    from load_portfolio or one generated in memory, and returns a copy with
+    PORTFOLIO_DTYPES column types and Stage and ECL columns attached.
+    """
+    results = portfolio.astype(PORTFOLIO_DTYPES)
+
+    principal = results["Principal"].to_numpy(dtype=np.float64)
+    initial_pd = results["Initial_PD"].to_numpy(dtype=np.float64)
+    current_pd = results["Current_PD"].to_numpy(dtype=np.float64)
+    maturity_years = results["Maturity_Years"].to_numpy(dtype=np.int64)
+    eir = results["EIR"].to_numpy(dtype=np.float64)
+    lgd = results["LGD"].to_numpy(dtype=np.float64)
+
+    stages = assign_stage_vectorized(initial_pd, current_pd)
+    ecls = calculate_weighted_ecl_vectorized(stages, current_pd, lgd, principal, maturity_years, eir)
+
+    results["Stage"] = stages
+    # Round once, at the end, so no precision is lost between scenarios
+    results["ECL"] = np.round(ecls, 2)
     return results
 
 
-def save_results(results: List[Dict], filepath: str):
-    """Write results to CSV."""
-    fieldnames = [
-        "Loan_ID",
-        "Sector",
-        "Principal",
-        "Initial_PD",
-        "Current_PD",
-        "Maturity_Years",
-        "EIR",
-        "LGD",
-        "Stage",
-        "ECL",
-    ]
-    with open(filepath, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(results)
+def save_results(results: pd.DataFrame, filepath: str):
+    """Write results to CSV with CRLF line endings."""
+    results.to_csv(filepath, columns=RESULT_COLUMNS, index=False, lineterminator="\r\n")
 
 
 def main():
@@ -183,11 +251,8 @@ def main():
     results = process_portfolio(portfolio)
 
     # Summary statistics
-    stage_counts = {1: 0, 2: 0, 3: 0}
-    total_ecl = 0.0
-    for r in results:
-        stage_counts[r["Stage"]] += 1
-        total_ecl += r["ECL"]
+    stage_counts = results["Stage"].value_counts().reindex((1, 2, 3), fill_value=0)
+    total_ecl = results["ECL"].sum()
 
     print("\n--- Stage Distribution ---")
     for s in (1, 2, 3):
@@ -7,11 +7,12 @@ Creates `ifrs9_portfolio.csv` with 500 loans (default). Columns:
 
 Usage: python ifrs9_data.py [--n N] [--out FILE]
 """
-import csv
 import math
-import random
 import argparse
 
+import numpy as np
+import pandas as pd
+
 
 def generate_portfolio(n=500, seed=42, stress=False):
     """Generate synthetic loan portfolio.
@@ -20,8 +21,11 @@ def generate_portfolio(n=500, seed=42, stress=False):
         n: Number of loans to generate
         seed: Random seed for reproducibility
         stress: If True, apply credit shocks (higher PD volatility + defaults)
+
+    Returns:
+        DataFrame with one row per loan
     """
-    random.seed(seed)
+    rng = np.random.default_rng(seed)
     sectors = [
         "Retail",
         "Corporate",
@@ -31,83 +35,61 @@ def generate_portfolio(n=500, seed=42, stress=False):
         "Sovereign",
     ]
 
-    rows = []
     min_principal = 5_000
     max_principal = 5_000_000
     log_min = math.log10(min_principal)
     log_max = math.log10(max_principal)
 
-    for i in range(1, n + 1):
-        loan_id = f"LOAN{i:05d}"
-        sector = random.choice(sectors)
-
-        # Principal (log-uniform to create a realistic skewed distribution)
-        principal = int(10 ** random.uniform(log_min, log_max))
-
-        # Initial PD sampled from a Beta distribution and scaled to [0, 0.20]
-        initial_pd = round(random.betavariate(0.8, 10) * 0.20, 4)
-        initial_pd = max(initial_pd, 0.0001)
-
-        # Current PD: apply stress or normal volatility
-        if stress:
-            # Stress mode: shocks from -50% to +500%
-            factor = random.uniform(0.5, 6.0)
-        else:
-            # Normal mode: mild deterioration/improvement
-            factor = random.uniform(0.8, 3.0)
-        
-        current_pd = round(min(initial_pd * factor, 0.9999), 4)
-
-        maturity_years = random.randint(1, 10)
-
-        # EIR between 1% and 5%
-        eir = round(random.uniform(0.01, 0.05), 4)
-
-        lgd = 0.45
-
-        stage = ""  # left blank to be calculated later
-
-        rows.append(
-            {
-                "Loan_ID": loan_id,
-                "Sector": sector,
-                "Principal": principal,
-                "Initial_PD": initial_pd,
-                "Current_PD": current_pd,
-                "Maturity_Years": maturity_years,
-                "EIR": eir,
-                "LGD": lgd,
-                "Stage": stage,
-            }
-        )
+    # All columns are drawn in bulk, one generator call per field
+    loan_ids = [f"LOAN{i:05d}" for i in range(1, n + 1)]
+    sector = rng.choice(sectors, n)
+
+    # Principal (log-uniform to create a realistic skewed distribution)
+    principal = (10 ** rng.uniform(log_min, log_max, n)).astype(np.int64)
+
+    # Initial PD sampled from a Beta distribution and scaled to [0, 0.20]
+    initial_pd = np.maximum(np.round(rng.beta(0.8, 10, n) * 0.20, 4), 0.0001)
+
+    # Current PD: apply stress or normal volatility
+    if stress:
+        # Stress mode: shocks from -50% to +500%
+        factor = rng.uniform(0.5, 6.0, n)
+    else:
+        # Normal mode: mild deterioration/improvement
+        factor = rng.uniform(0.8, 3.0, n)
+
+    current_pd = np.round(np.minimum(initial_pd * factor, 0.9999), 4)
+
+    maturity_years = rng.integers(1, 11, n)
+
+    # EIR between 1% and 5%
+    eir = np.round(rng.uniform(0.01, 0.05, n), 4)
+
+    lgd = np.full(n, 0.45)
 
     # Stress mode: force 2% of portfolio into default (PD > 50%)
     if stress:
         n_defaults = max(1, int(n * 0.02))
-        default_indices = random.sample(range(len(rows)), n_defaults)
-        for idx in default_indices:
-            rows[idx]["Current_PD"] = round(random.uniform(0.51, 0.99), 4)
-
-    return rows
-
-
-def save_csv(rows, out_file="ifrs9_portfolio.csv"):
-    fieldnames = [
-        "Loan_ID",
-        "Sector",
-        "Principal",
-        "Initial_PD",
-        "Current_PD",
-        "Maturity_Years",
-        "EIR",
-        "LGD",
-        "Stage",
-    ]
-    with open(out_file, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for r in rows:
-            writer.writerow(r)
+        default_indices = rng.choice(n, n_defaults, replace=False)
+        current_pd[default_indices] = np.round(rng.uniform(0.51, 0.99, n_defaults), 4)
+
+    return pd.DataFrame(
+        {
+            "Loan_ID": loan_ids,
+            "Sector": sector,
+            "Principal": principal,
+            "Initial_PD": initial_pd,
+            "Current_PD": current_pd,
+            "Maturity_Years": maturity_years,
+            "EIR": eir,
+            "LGD": lgd,
+            "Stage": "",  # left blank to be calculated later
+        }
+    )
+
+
+def save_csv(portfolio, out_file="ifrs9_portfolio.csv"):
+    portfolio.to_csv(out_file, index=False, lineterminator="\r\n")
 
 
 def main():
@@ -118,10 +100,10 @@ def main():
     parser.add_argument("--stress", action="store_true", help="apply credit shocks (higher volatility + 2%% defaults)")
     args = parser.parse_args()
 
-    rows = generate_portfolio(n=args.n, seed=args.seed, stress=args.stress)
-    save_csv(rows, out_file=args.out)
+    portfolio = generate_portfolio(n=args.n, seed=args.seed, stress=args.stress)
+    save_csv(portfolio, out_file=args.out)
     mode = "STRESS" if args.stress else "NORMAL"
-    print(f"Wrote {len(rows)} loans to {args.out} [{mode} mode]")
+    print(f"Wrote {len(portfolio)} loans to {args.out} [{mode} mode]")
 
 
 if __name__ == "__main__":
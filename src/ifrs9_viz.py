@@ -8,9 +8,10 @@ Generates:
 
 Usage: python ifrs9_viz.py
 """
-import csv
-from typing import List, Dict
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 
 
@@ -32,85 +33,211 @@ def calculate_ecl_scenario(
     if stage == 1:
         ecl = pd_adj * lgd * ead
     else:
-        ecl = 0.0
-        cum_survival = 1.0
-        for t in range(1, maturity_years + 1):
-            marginal_pd = cum_survival * pd_adj
-            discount_factor = 1.0 / ((1.0 + eir) ** t)
-            ecl += marginal_pd * lgd * ead * discount_factor
-            cum_survival *= (1.0 - pd_adj)
+        # Lifetime: discounted marginal losses form a geometric series in q,
+        # summed in closed form (see calculate_ecl_vectorized)
+        d = 1.0 / (1.0 + eir)
+        q = (1.0 - pd_adj) * d
+        if abs(1.0 - q) < 1e-12:
+            ecl = pd_adj * lgd * ead * d * maturity_years
+        else:
+            ecl = pd_adj * lgd * ead * d * (1.0 - q ** maturity_years) / (1.0 - q)
     return ecl
 
 
+def calculate_ecl_vectorized(
+    stage: np.ndarray,
+    current_pd: np.ndarray,
+    lgd: np.ndarray,
+    ead: np.ndarray,
+    maturity_years: np.ndarray,
+    eir: np.ndarray,
+    pd_multiplier,
+) -> np.ndarray:
+    """Compute ECL under a specific scenario for arrays of loans.
+
+    The lifetime sum of discounted marginal losses is a geometric series:
+    with q = (1 - PD) / (1 + EIR) it equals
+    PD * LGD * EAD / (1 + EIR) * (1 - q^T) / (1 - q).
+
+    All arguments broadcast against each other, so passing loan columns of
+    shape (n_loans, 1) with an array of multipliers gives one column per
+    scenario, with the per-loan loss and discount factors computed once for
+    all of them.
+
+    Both the 12-month and the lifetime form are evaluated for every loan
+    and the stage mask selects between them, so mixed stages do not split
+    the batch.
+    """
+    pd_adj = np.minimum(current_pd * pd_multiplier, 1.0)
+    ecl_12m = pd_adj * (lgd * ead)
+
+    inv_eir = 1.0 / (1.0 + eir)
+    q = (1.0 - pd_adj) * inv_eir
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = np.where(q == 1.0, maturity_years, (1.0 - q ** maturity_years) / (1.0 - q))
+    ecl_lifetime = ecl_12m * (inv_eir * annuity)
+    return np.where(stage == 1, ecl_12m, ecl_lifetime)
+
+
+def _scenario_ecl(data: pd.DataFrame, pd_multipliers: np.ndarray) -> np.ndarray:
+    """(n_loans, n_scenarios) ECL of every loan, computed in one batch."""
+    return calculate_ecl_vectorized(
+        stage=data["Stage"].to_numpy()[:, None],
+        current_pd=data["Current_PD"].to_numpy()[:, None],
+        lgd=data["LGD"].to_numpy()[:, None],
+        ead=data["Principal"].to_numpy()[:, None],
+        maturity_years=data["Maturity_Years"].to_numpy()[:, None],
+        eir=data["EIR"].to_numpy()[:, None],
+        pd_multiplier=pd_multipliers,
+    )
+
+
 # ---------------------------------------------------------------------------
 # Data Loading
 # ---------------------------------------------------------------------------
-def load_results(filepath: str = "data/ifrs9_results.csv") -> List[Dict]:
+RESULT_DTYPES = {
+    "Loan_ID": "string",
+    "Sector": "category",
+    "Principal": "float64",
+    "Initial_PD": "float64",
+    "Current_PD": "float64",
+    "Maturity_Years": "int32",
+    "EIR": "float64",
+    "LGD": "float64",
+    "Stage": "int8",
+    "ECL": "float64",
+}
+
+
+def load_results(filepath: str = "data/ifrs9_results.csv") -> pd.DataFrame:
     """Load the ECL results CSV."""
-    rows = []
-    with open(filepath, "r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            rows.append({
-                "Loan_ID": row["Loan_ID"],
-                "Sector": row["Sector"],
-                "Principal": float(row["Principal"]),
-                "Initial_PD": float(row["Initial_PD"]),
-                "Current_PD": float(row["Current_PD"]),
-                "Maturity_Years": int(row["Maturity_Years"]),
-                "EIR": float(row["EIR"]),
-                "LGD": float(row["LGD"]),
-                "Stage": int(row["Stage"]),
-                "ECL": float(row["ECL"]),
-            })
-    return rows
+    return pd.read_csv(filepath, dtype=RESULT_DTYPES)
 
 
 # ---------------------------------------------------------------------------
-# Chart 1: Sunburst — Sector → Stage
+# Aggregation (computed once, shared by the charts and the dashboard)
+# ---------------------------------------------------------------------------
+def encode_sectors(data: pd.DataFrame):
+    """Integer sector codes for np.bincount, with the sorted sector names."""
+    sector = data["Sector"].astype("category").cat.remove_unused_categories()
+    sector = sector.cat.reorder_categories(sorted(sector.cat.categories))
+    return sector.cat.codes.to_numpy(dtype=np.intp), sector.cat.categories.tolist()
+
+
+def aggregate_principals(data: pd.DataFrame, encoded_sectors=None):
+    """Principal totals by Sector, by (Sector, Stage) and for the portfolio.
+
+    The (Sector, Stage) totals are a sectors x stages table with columns
+    1, 2 and 3; rows with any other Stage value count towards their sector
+    but not towards a stage. `encoded_sectors` is the result of
+    encode_sectors(data), computed here if not given.
+    """
+    if encoded_sectors is None:
+        encoded_sectors = encode_sectors(data)
+    sector_codes, sectors = encoded_sectors
+    principal = data["Principal"].to_numpy()
+    n_sectors = len(sectors)
+
+    sector_totals = np.bincount(sector_codes, weights=principal, minlength=n_sectors)
+    stage = data["Stage"].to_numpy(dtype=np.intp)
+    staged = (stage >= 1) & (stage <= 3)
+    idx = sector_codes[staged] * 3 + (stage[staged] - 1)
+    stage_totals = np.bincount(idx, weights=principal[staged], minlength=n_sectors * 3)
+
+    return (
+        pd.Series(sector_totals, index=sectors),
+        pd.DataFrame(stage_totals.reshape(n_sectors, 3), index=sectors, columns=[1, 2, 3]),
+        sector_totals.sum(),
+    )
+
+
+def compute_scenario_ecls(data: pd.DataFrame, encoded_sectors=None):
+    """ECL totals by Sector under the Base and Downturn scenarios.
+
+    `encoded_sectors` is the result of encode_sectors(data), computed here
+    if not given.
+    """
+    if encoded_sectors is None:
+        encoded_sectors = encode_sectors(data)
+    sector_codes, sectors = encoded_sectors
+    ecls = _scenario_ecl(data, np.array([1.0, 1.5]))
+    ecl_base = np.bincount(sector_codes, weights=ecls[:, 0], minlength=len(sectors))
+    ecl_downturn = np.bincount(sector_codes, weights=ecls[:, 1], minlength=len(sectors))
+    return pd.Series(ecl_base, index=sectors), pd.Series(ecl_downturn, index=sectors)
+
+
+def _sunburst_nodes(principals, stage_label: str = "Stage {stage}"):
+    """Labels, parents and values of the Portfolio -> Sector -> Stage tree.
+
+    Nodes are read straight off the aggregate arrays; stages with no
+    principal are left out. `stage_label` is formatted with `sector` and
+    `stage` to name the stage nodes.
+    """
+    sector_total, agg, portfolio_total = principals
+    sectors = sector_total.index.tolist()
+    stage_totals = agg.to_numpy()
+    non_empty = stage_totals > 0
+    sector_idx, stage_idx = np.nonzero(non_empty)
+
+    labels = ["Portfolio"] + sectors + [
+        stage_label.format(sector=sectors[i], stage=s + 1)
+        for i, s in zip(sector_idx.tolist(), stage_idx.tolist())
+    ]
+    parents = [""] + ["Portfolio"] * len(sectors) + [sectors[i] for i in sector_idx.tolist()]
+    values = [portfolio_total] + sector_total.tolist() + stage_totals[non_empty].tolist()
+    return labels, parents, values
+
+
 # ---------------------------------------------------------------------------
-def create_sunburst(data: List[Dict]) -> go.Figure:
-    """Create a sunburst chart showing Sector -> Stage hierarchy."""
-    # Aggregate Principal by Sector and Stage
-    agg = {}
-    for row in data:
-        key = (row["Sector"], row["Stage"])
-        agg[key] = agg.get(key, 0) + row["Principal"]
-
-    labels = ["Portfolio"]
-    parents = [""]
-    values = [sum(r["Principal"] for r in data)]
-
-    # Sectors (level 1)
-    sectors = sorted(set(r["Sector"] for r in data))
-    for sector in sectors:
-        sector_total = sum(r["Principal"] for r in data if r["Sector"] == sector)
-        labels.append(sector)
-        parents.append("Portfolio")
-        values.append(sector_total)
-
-    # Stages (level 2)
-    for sector in sectors:
-        for stage in (1, 2, 3):
-            key = (sector, stage)
-            if key in agg and agg[key] > 0:
-                labels.append(f"Stage {stage}")
-                parents.append(sector)
-                values.append(agg[key])
-
-    fig = go.Figure(go.Sunburst(
+# Shared Styling & Traces
+# ---------------------------------------------------------------------------
+# Layout shared by every chart, layered over plotly's default theme
+pio.templates["ifrs9"] = go.layout.Template(layout=dict(title=dict(x=0.5)))
+TEMPLATE = "plotly+ifrs9"
+
+
+def _sunburst_trace(labels, parents, values, **marker) -> go.Sunburst:
+    """Sunburst trace of principal by node; `marker` extends the Blues scale."""
+    return go.Sunburst(
         labels=labels,
         parents=parents,
         values=values,
         branchvalues="total",
         hovertemplate="<b>%{label}</b><br>Principal: %{value:,.0f}<extra></extra>",
-        marker=dict(
-            colors=values,
-            colorscale="Blues",
-        ),
-    ))
+        marker=dict(colorscale="Blues", **marker),
+    )
+
+
+def _scenario_bars(scenario_ecls, show_text: bool = True):
+    """Base and Downturn ECL bar traces over the sorted sectors."""
+    ecl_base, ecl_downturn = scenario_ecls
+    sectors = sorted(ecl_base.index)
+
+    traces = []
+    for name, ecl, color in (("Base", ecl_base, "#3498db"), ("Downturn", ecl_downturn, "#e74c3c")):
+        y = ecl[sectors].tolist()
+        text = dict(text=[f"{v:,.0f}" for v in y], textposition="outside") if show_text else {}
+        traces.append(go.Bar(name=name, x=sectors, y=y, marker_color=color, **text))
+    return traces
+
+
+# ---------------------------------------------------------------------------
+# Chart 1: Sunburst — Sector → Stage
+# ---------------------------------------------------------------------------
+def create_sunburst(data: pd.DataFrame, principals=None) -> go.Figure:
+    """Create a sunburst chart showing Sector -> Stage hierarchy.
+
+    `principals` is the result of aggregate_principals(data), computed here
+    if not given.
+    """
+    if principals is None:
+        principals = aggregate_principals(data)
+    labels, parents, values = _sunburst_nodes(principals)
+
+    fig = go.Figure(_sunburst_trace(labels, parents, values, colors=values))
     fig.update_layout(
-        title=dict(text="Portfolio Breakdown by Sector → Stage", x=0.5),
+        template=TEMPLATE,
+        title=dict(text="Portfolio Breakdown by Sector → Stage"),
         margin=dict(t=50, l=10, r=10, b=10),
     )
     return fig
@@ -119,55 +246,19 @@ def create_sunburst(data: List[Dict]) -> go.Figure:
 # ---------------------------------------------------------------------------
 # Chart 2: Bar Chart — ECL Base vs Downturn by Sector
 # ---------------------------------------------------------------------------
-def create_ecl_comparison_bar(data: List[Dict]) -> go.Figure:
-    """Bar chart comparing ECL under Base vs Downturn scenarios by sector."""
-    sectors = sorted(set(r["Sector"] for r in data))
-
-    ecl_base = {s: 0.0 for s in sectors}
-    ecl_downturn = {s: 0.0 for s in sectors}
-
-    for row in data:
-        sector = row["Sector"]
-        base_ecl = calculate_ecl_scenario(
-            stage=row["Stage"],
-            current_pd=row["Current_PD"],
-            lgd=row["LGD"],
-            ead=row["Principal"],
-            maturity_years=row["Maturity_Years"],
-            eir=row["EIR"],
-            pd_multiplier=1.0,  # Base
-        )
-        downturn_ecl = calculate_ecl_scenario(
-            stage=row["Stage"],
-            current_pd=row["Current_PD"],
-            lgd=row["LGD"],
-            ead=row["Principal"],
-            maturity_years=row["Maturity_Years"],
-            eir=row["EIR"],
-            pd_multiplier=1.5,  # Downturn
-        )
-        ecl_base[sector] += base_ecl
-        ecl_downturn[sector] += downturn_ecl
-
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        name="Base",
-        x=sectors,
-        y=[ecl_base[s] for s in sectors],
-        marker_color="#3498db",
-        text=[f"{ecl_base[s]:,.0f}" for s in sectors],
-        textposition="outside",
-    ))
-    fig.add_trace(go.Bar(
-        name="Downturn",
-        x=sectors,
-        y=[ecl_downturn[s] for s in sectors],
-        marker_color="#e74c3c",
-        text=[f"{ecl_downturn[s]:,.0f}" for s in sectors],
-        textposition="outside",
-    ))
+def create_ecl_comparison_bar(data: pd.DataFrame, scenario_ecls=None) -> go.Figure:
+    """Bar chart comparing ECL under Base vs Downturn scenarios by sector.
+
+    `scenario_ecls` is the result of compute_scenario_ecls(data), computed
+    here if not given.
+    """
+    if scenario_ecls is None:
+        scenario_ecls = compute_scenario_ecls(data)
+
+    fig = go.Figure(_scenario_bars(scenario_ecls))
     fig.update_layout(
-        title=dict(text="ECL Comparison: Base vs Downturn by Sector", x=0.5),
+        template=TEMPLATE,
+        title=dict(text="ECL Comparison: Base vs Downturn by Sector"),
         xaxis_title="Sector",
         yaxis_title="ECL Amount",
         barmode="group",
@@ -180,10 +271,10 @@ def create_ecl_comparison_bar(data: List[Dict]) -> go.Figure:
 # ---------------------------------------------------------------------------
 # Chart 3: KPI Cards — Total Provisions & Coverage Ratio
 # ---------------------------------------------------------------------------
-def create_kpi_cards(data: List[Dict]) -> go.Figure:
+def create_kpi_cards(data: pd.DataFrame) -> go.Figure:
     """Create KPI indicator cards for total provisions and coverage ratio."""
-    total_provisions = sum(r["ECL"] for r in data)
-    total_exposure = sum(r["Principal"] for r in data)
+    total_provisions = data["ECL"].sum()
+    total_exposure = data["Principal"].sum()
     coverage_ratio = (total_provisions / total_exposure * 100) if total_exposure > 0 else 0
 
     fig = make_subplots(
@@ -232,7 +323,8 @@ def create_kpi_cards(data: List[Dict]) -> go.Figure:
     ), row=1, col=2)
 
     fig.update_layout(
-        title=dict(text="IFRS9 Key Performance Indicators", x=0.5, font=dict(size=22)),
+        template=TEMPLATE,
+        title=dict(text="IFRS9 Key Performance Indicators", font=dict(size=22)),
         margin=dict(t=80, l=30, r=30, b=30),
         paper_bgcolor="#f9f9f9",
     )
@@ -242,8 +334,12 @@ def create_kpi_cards(data: List[Dict]) -> go.Figure:
 # ---------------------------------------------------------------------------
 # Combined Dashboard
 # ---------------------------------------------------------------------------
-def create_dashboard(data: List[Dict]) -> go.Figure:
-    """Create a combined dashboard with all visualizations."""
+def create_dashboard(data: pd.DataFrame, principals=None, scenario_ecls=None) -> go.Figure:
+    """Create a combined dashboard with all visualizations.
+
+    Accepts the same precomputed aggregates as create_sunburst and
+    create_ecl_comparison_bar so they are not recomputed.
+    """
     from plotly.subplots import make_subplots
 
     # We'll create individual figures and combine them in HTML
@@ -266,66 +362,20 @@ def create_dashboard(data: List[Dict]) -> go.Figure:
     )
 
     # --- Sunburst data ---
-    agg = {}
-    for row in data:
-        key = (row["Sector"], row["Stage"])
-        agg[key] = agg.get(key, 0) + row["Principal"]
-
-    labels = ["Portfolio"]
-    parents = [""]
-    values = [sum(r["Principal"] for r in data)]
-
-    sectors = sorted(set(r["Sector"] for r in data))
-    for sector in sectors:
-        sector_total = sum(r["Principal"] for r in data if r["Sector"] == sector)
-        labels.append(sector)
-        parents.append("Portfolio")
-        values.append(sector_total)
-
-    for sector in sectors:
-        for stage in (1, 2, 3):
-            key = (sector, stage)
-            if key in agg and agg[key] > 0:
-                labels.append(f"{sector} - Stage {stage}")
-                parents.append(sector)
-                values.append(agg[key])
-
-    fig.add_trace(go.Sunburst(
-        labels=labels,
-        parents=parents,
-        values=values,
-        branchvalues="total",
-        hovertemplate="<b>%{label}</b><br>Principal: %{value:,.0f}<extra></extra>",
-        marker=dict(colorscale="Blues"),
-    ), row=1, col=1)
+    if principals is None:
+        principals = aggregate_principals(data)
+    labels, parents, values = _sunburst_nodes(principals, "{sector} - Stage {stage}")
+    fig.add_trace(_sunburst_trace(labels, parents, values), row=1, col=1)
 
     # --- Bar chart data ---
-    ecl_base = {s: 0.0 for s in sectors}
-    ecl_downturn = {s: 0.0 for s in sectors}
-
-    for row in data:
-        sector = row["Sector"]
-        ecl_base[sector] += calculate_ecl_scenario(
-            row["Stage"], row["Current_PD"], row["LGD"], row["Principal"],
-            row["Maturity_Years"], row["EIR"], 1.0
-        )
-        ecl_downturn[sector] += calculate_ecl_scenario(
-            row["Stage"], row["Current_PD"], row["LGD"], row["Principal"],
-            row["Maturity_Years"], row["EIR"], 1.5
-        )
-
-    fig.add_trace(go.Bar(
-        name="Base", x=sectors, y=[ecl_base[s] for s in sectors],
-        marker_color="#3498db", showlegend=True,
-    ), row=1, col=2)
-    fig.add_trace(go.Bar(
-        name="Downturn", x=sectors, y=[ecl_downturn[s] for s in sectors],
-        marker_color="#e74c3c", showlegend=True,
-    ), row=1, col=2)
+    if scenario_ecls is None:
+        scenario_ecls = compute_scenario_ecls(data)
+    for bar in _scenario_bars(scenario_ecls, show_text=False):
+        fig.add_trace(bar, row=1, col=2)
 
     # --- KPIs ---
-    total_provisions = sum(r["ECL"] for r in data)
-    total_exposure = sum(r["Principal"] for r in data)
+    total_provisions = data["ECL"].sum()
+    total_exposure = data["Principal"].sum()
     coverage_ratio = (total_provisions / total_exposure * 100) if total_exposure > 0 else 0
 
     fig.add_trace(go.Indicator(
@@ -352,7 +402,8 @@ def create_dashboard(data: List[Dict]) -> go.Figure:
     ), row=2, col=2)
 
     fig.update_layout(
-        title=dict(text="<b>IFRS9 ECL Dashboard</b>", x=0.5, font=dict(size=24)),
+        template=TEMPLATE,
+        title=dict(text="<b>IFRS9 ECL Dashboard</b>", font=dict(size=24)),
         barmode="group",
         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.75),
         height=800,
@@ -362,6 +413,24 @@ def create_dashboard(data: List[Dict]) -> go.Figure:
     return fig
 
 
+# ---------------------------------------------------------------------------
+# HTML Output
+# ---------------------------------------------------------------------------
+def save_html(fig: go.Figure, filepath: str):
+    """Write a figure as an HTML page.
+
+    plotly.js is written once as plotly.min.js next to the page and shared
+    by all charts, instead of embedding the full bundle in every file.
+    """
+    fig.write_html(
+        filepath,
+        include_plotlyjs="directory",
+        include_mathjax=False,
+        validate=False,
+        auto_open=False,
+    )
+
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
@@ -372,22 +441,27 @@ def main():
 
     print("\nGenerating visualizations...")
 
+    # Aggregates shared by the individual charts and the dashboard
+    encoded_sectors = encode_sectors(data)
+    principals = aggregate_principals(data, encoded_sectors)
+    scenario_ecls = compute_scenario_ecls(data, encoded_sectors)
+
     # Individual charts (saved as separate HTML files)
-    sunburst_fig = create_sunburst(data)
-    sunburst_fig.write_html("chart_sunburst.html")
+    sunburst_fig = create_sunburst(data, principals)
+    save_html(sunburst_fig, "chart_sunburst.html")
     print("  ✓ chart_sunburst.html")
 
-    bar_fig = create_ecl_comparison_bar(data)
-    bar_fig.write_html("chart_ecl_comparison.html")
+    bar_fig = create_ecl_comparison_bar(data, scenario_ecls)
+    save_html(bar_fig, "chart_ecl_comparison.html")
     print("  ✓ chart_ecl_comparison.html")
 
     kpi_fig = create_kpi_cards(data)
-    kpi_fig.write_html("chart_kpi.html")
+    save_html(kpi_fig, "chart_kpi.html")
     print("  ✓ chart_kpi.html")
 
     # Combined dashboard
-    dashboard_fig = create_dashboard(data)
-    dashboard_fig.write_html("ifrs9_dashboard.html")
+    dashboard_fig = create_dashboard(data, principals, scenario_ecls)
+    save_html(dashboard_fig, "ifrs9_dashboard.html")
     print("  ✓ ifrs9_dashboard.html (combined dashboard)")
 
     print("\nDone! Open ifrs9_dashboard.html in a browser to view the dashboard.")